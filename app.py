@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
+import atexit
 import os
 import csv
+import hashlib
 import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import IO, List, Dict, Any, Optional, Set, Tuple
 
-from flask import Flask, request, redirect, url_for, render_template_string, send_from_directory, flash
+from flask import Flask, request, redirect, url_for, render_template, send_from_directory, flash
 
 # Import the existing processing logic
 import process_docs as pd
@@ -14,6 +21,10 @@ ROOT = os.path.dirname(os.path.abspath(__file__))
 OUT_DIR = os.path.join(ROOT, "output")
 UPLOAD_DIR = os.path.join(ROOT, "uploads")
 CSV_PATH = os.path.join(OUT_DIR, "summary.csv")
+DB_PATH = os.path.join(OUT_DIR, "summary.db")
+PAGE_SIZE = 50  # index rows per page (override with ?page_size=, up to MAX_PAGE_SIZE)
+MAX_PAGE_SIZE = 200
+UPLOAD_SPOOL_BYTES = 8 * 1024 * 1024  # uploads larger than this spill to a temp file while hashing
 
 os.makedirs(OUT_DIR, exist_ok=True)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -22,6 +33,9 @@ app = Flask(__name__)
 app.secret_key = "dev-secret-change-me"  # for flash messages only
 
 ALLOWED_EXTS = pd.SUPPORTED_EXTS
+# Processes used for multi-file uploads. Default 1 processes inline in the request thread:
+# forking a pool from a threaded server per request is slow and deadlock-prone, so it is opt-in.
+POOL_WORKERS = max(int(os.environ.get("DATAAPP_POOL_WORKERS", "1")), 1)
 
 
 # ------- Helpers -------
@@ -30,85 +44,290 @@ def allowed_file(filename: str) -> bool:
     return ext in ALLOWED_EXTS
 
 
-def append_outputs(ds: pd.DocSummary):
-    # CSV
-    csv_new = not os.path.exists(CSV_PATH)
-    with open(CSV_PATH, "a", encoding="utf-8", newline="") as csvf:
-        writer = csv.writer(csvf)
-        if csv_new:
-            writer.writerow(pd.DocSummary.csv_header())
-        writer.writerow(ds.to_csv_row())
-
-    # Per-tag JSONL routes
-    def write_route(tag: str, record: Dict[str, Any]):
-        fname = os.path.join(OUT_DIR, f"route_{pd.sanitize_filename(tag)}.jsonl")
-        with open(fname, "a", encoding="utf-8") as fh:
-            fh.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-    rec = {
-        "source_path": ds.source_path,
-        "file_name": ds.file_name,
-        "file_sha256": ds.file_sha256,
-        "language": ds.language,
-        "title": ds.title,
-        "summary_sentences": ds.summary_sentences,
-        "action_items": ds.action_items,
-        "tags": ds.tags,
-        "detected_dates": ds.detected_dates,
-        "detected_amounts": ds.detected_amounts,
-        "first_seen_at": ds.first_seen_at,
-    }
-    for tag in ds.tags:
-        write_route(tag, rec)
-
-    # Per-file JSON
-    per_json = os.path.join(OUT_DIR, pd.sanitize_filename(ds.file_name) + ".json")
-    with open(per_json, "w", encoding="utf-8") as jf:
-        json.dump(rec, jf, ensure_ascii=False, indent=2)
+def spool_upload(file) -> Tuple[IO[bytes], str]:
+    # Buffer the upload (in memory up to UPLOAD_SPOOL_BYTES) and hash it in the same pass.
+    # Nothing reaches UPLOAD_DIR until the caller knows the content is new.
+    h = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    while chunk := file.stream.read(1 << 20):
+        h.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, h.hexdigest()
+
+
+# route_<TAG>.jsonl handles stay open for the life of the process (flushed after each batch);
+# the lock serializes batches from concurrent request threads, and each flush appends whole
+# records under flock, so other worker processes can share the files. Smaller buffers than
+# the CLI's, since up to 32 of them stay open per worker.
+_ROUTES = pd.RouteHandlePool(OUT_DIR, max_open=32, buffering=1 << 16)
+atexit.register(_ROUTES.close)
+_OUTPUT_LOCK = threading.Lock()
+
+
+def append_outputs_batch(summaries: List[pd.DocSummary]):
+    # CSV, per-tag JSONL routes and per-file JSON, each opened once for the batch
+    if not summaries:
+        return
+    with _OUTPUT_LOCK:
+        # Pick up outside CSV appends first, so marking the CSV synced below does not skip them
+        synced_size = _csv_key_size(sync_db_from_csv())
+        with pd.OutputWriter(OUT_DIR, per_file_json=True, routes=_ROUTES) as out:
+            records = [out.write(ds) for ds in summaries]
+        expected_size = synced_size + out.csv_bytes_written
+
+        # Lookup index
+        with closing(_connect()) as conn, conn:
+            for rec in records:
+                _insert_doc(conn, rec)
+            # Anything beyond our own rows was appended by another process in the meantime;
+            # leave the key stale so the next sync_db_from_csv() indexes it
+            key = _csv_key()
+            if _csv_key_size(key) == expected_size:
+                _mark_csv_synced(conn, key)
+        invalidate_filters_cache()
+
+
+def output_names() -> Set[str]:
+    # One directory listing instead of an exists() check per row
+    try:
+        return set(os.listdir(OUT_DIR))
+    except FileNotFoundError:
+        return set()
 
 
 def read_csv_rows() -> List[Dict[str, Any]]:
     if not os.path.exists(CSV_PATH):
         return []
     rows: List[Dict[str, Any]] = []
+    existing = output_names()
     with open(CSV_PATH, "r", encoding="utf-8", newline="") as f:
         reader = csv.DictReader(f)
         for r in reader:
             # Compute convenience fields
             per_json_name = pd.sanitize_filename(r["file_name"]) + ".json"
-            json_path = os.path.join(OUT_DIR, per_json_name)
             r = dict(r)
             r["per_json"] = per_json_name
-            r["has_json"] = os.path.exists(json_path)
+            r["has_json"] = per_json_name in existing
             rows.append(r)
     rows.sort(key=lambda r: r.get("first_seen_at", ""), reverse=True)
     return rows
 
 
+def record_from_csv_row(r: Dict[str, Any]) -> Dict[str, Any]:
+    # Load the per-file JSON if present (and for the same file); else reconstruct from CSV row
+    json_path = os.path.join(OUT_DIR, r["per_json"])
+    if r["has_json"]:
+        try:
+            with open(json_path, "r", encoding="utf-8") as jf:
+                rec = json.load(jf)
+            if rec.get("file_sha256") == r.get("file_sha256"):
+                return rec
+        except (OSError, ValueError):
+            pass
+    # Fallback: minimal reconstruction
+    return {
+        "source_path": r.get("source_path"),
+        "file_name": r.get("file_name"),
+        "file_sha256": r.get("file_sha256"),
+        "language": r.get("language"),
+        "title": r.get("title"),
+        "summary_sentences": (r.get("summary") or "").split(" • ") if r.get("summary") else [],
+        "action_items": (r.get("action_items") or "").split(" | ") if r.get("action_items") else [],
+        "tags": (r.get("tags") or "").split("; ") if r.get("tags") else ["General"],
+        "detected_dates": (r.get("detected_dates") or "").split("; ") if r.get("detected_dates") else [],
+        "detected_amounts": (r.get("detected_amounts") or "").split("; ") if r.get("detected_amounts") else [],
+        "first_seen_at": r.get("first_seen_at"),
+    }
+
+
+# ------- Lookup index (sqlite) -------
+# summary.csv stays the export artifact; summary.db answers lookups and filtering.
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _search_text(rec: Dict[str, Any]) -> str:
+    # Same fields the index page searches, joined as in summary.csv
+    return " ".join([
+        rec.get("file_name") or "",
+        rec.get("title") or "",
+        " • ".join(rec.get("summary_sentences") or []),
+        " | ".join(rec.get("action_items") or []),
+        "; ".join(rec.get("detected_dates") or []),
+        "; ".join(rec.get("detected_amounts") or []),
+    ]).lower()
+
+
+def _insert_doc(conn: sqlite3.Connection, rec: Dict[str, Any]):
+    conn.execute(
+        "INSERT OR REPLACE INTO docs (file_sha256, file_name, language, tags, detected_dates,"
+        " detected_amounts, first_seen_at, search_text, json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            rec["file_sha256"],
+            rec["file_name"],
+            rec.get("language"),
+            "; ".join(rec.get("tags") or []),
+            "; ".join(rec.get("detected_dates") or []),
+            "; ".join(rec.get("detected_amounts") or []),
+            rec.get("first_seen_at"),
+            _search_text(rec),
+            pd.dumps_json(rec),
+        ),
+    )
+
+
+def init_db():
+    with closing(_connect()) as conn, conn:
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                file_sha256 TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                language TEXT,
+                tags TEXT,
+                detected_dates TEXT,
+                detected_amounts TEXT,
+                first_seen_at TEXT,
+                search_text TEXT,
+                json TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS docs_language ON docs (language);
+            CREATE INDEX IF NOT EXISTS docs_first_seen_at ON docs (first_seen_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+    sync_db_from_csv()
+
+
+def _csv_key() -> Optional[str]:
+    try:
+        st = os.stat(CSV_PATH)
+    except FileNotFoundError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _csv_key_size(key: Optional[str]) -> int:
+    return int(key.rsplit(":", 1)[1]) if key else 0
+
+
+def _mark_csv_synced(conn: sqlite3.Connection, key: Optional[str]):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_key', ?)", (key,))
+    _CSV_SYNCED["key"] = key
+
+
+# summary.csv (mtime, size) this process last saw fully indexed in summary.db
+_CSV_SYNCED: Dict[str, Any] = {"key": None}
+
+
+def sync_db_from_csv() -> Optional[str]:
+    # Index rows appended to summary.csv outside the web app (e.g. by the CLI). Cheap when the
+    # CSV is unchanged: one stat() here, and the key in summary.db is shared by all workers.
+    # Returns the CSV key now known to be indexed (None while there is no CSV).
+    key = _csv_key()
+    if key is None or key == _CSV_SYNCED["key"]:
+        return key
+    with closing(_connect()) as conn, conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'csv_key'").fetchone()
+        if row is None or row["value"] != key:
+            known = {sha for (sha,) in conn.execute("SELECT file_sha256 FROM docs")}
+            for r in read_csv_rows():  # newest first, so the latest row per sha wins
+                sha = r.get("file_sha256")
+                if sha and r.get("file_name") and sha not in known:
+                    _insert_doc(conn, record_from_csv_row(r))
+                    known.add(sha)
+                    invalidate_filters_cache()
+        _mark_csv_synced(conn, key)
+    return key
+
+
+def _filter_sql(q: str, tag: str, lang: str) -> Tuple[str, List[Any]]:
+    where = " WHERE 1=1"
+    params: List[Any] = []
+    if tag:
+        where += " AND instr(tags, ?) > 0"
+        params.append(tag)
+    if lang:
+        where += " AND language = ?"
+        params.append(lang)
+    if q:
+        where += " AND instr(search_text, ?) > 0"
+        params.append(q.lower())
+    return where, params
+
+
+def count_rows(q: str = "", tag: str = "", lang: str = "") -> int:
+    where, params = _filter_sql(q, tag, lang)
+    with closing(_connect()) as conn:
+        return conn.execute("SELECT COUNT(*) FROM docs" + where, params).fetchone()[0]
+
+
+def query_rows(
+    q: str = "", tag: str = "", lang: str = "", limit: int = -1, offset: int = 0
+) -> List[Dict[str, Any]]:
+    # Only the columns the index table shows; limit=-1 means no limit
+    where, params = _filter_sql(q, tag, lang)
+    sql = (
+        "SELECT file_sha256, file_name, language, tags, detected_dates, detected_amounts, first_seen_at"
+        " FROM docs" + where + " ORDER BY first_seen_at DESC LIMIT ? OFFSET ?"
+    )
+
+    rows: List[Dict[str, Any]] = []
+    with closing(_connect()) as conn:
+        for r in conn.execute(sql, params + [limit, offset]):
+            r = dict(r)
+            per_json_name = pd.sanitize_filename(r["file_name"]) + ".json"
+            r["per_json"] = per_json_name
+            # Only this page's rows are checked, so the cost does not grow with output/
+            r["has_json"] = os.path.exists(os.path.join(OUT_DIR, per_json_name))
+            rows.append(r)
+    return rows
+
+
+# Sorted filter options for the index page, rebuilt only when summary.csv changes
+# (every writer appends to it) or rows are inserted into summary.db
+_FILTERS_CACHE: Dict[str, Any] = {"key": None, "tags": [], "langs": []}
+
+
+def invalidate_filters_cache():
+    _FILTERS_CACHE["key"] = None
+
+
+def available_filters() -> Tuple[List[str], List[str]]:
+    key = _csv_key()
+    if key is not None and _FILTERS_CACHE["key"] == key:
+        return _FILTERS_CACHE["tags"], _FILTERS_CACHE["langs"]
+
+    tag_set = set()
+    lang_set = set()
+    with closing(_connect()) as conn:
+        for (tags,) in conn.execute("SELECT DISTINCT tags FROM docs WHERE tags != ''"):
+            for t in tags.split("; "):
+                if t:
+                    tag_set.add(t)
+        for (lang,) in conn.execute("SELECT DISTINCT language FROM docs WHERE language != ''"):
+            lang_set.add(lang)
+    _FILTERS_CACHE.update(key=key, tags=sorted(tag_set), langs=sorted(lang_set))
+    return _FILTERS_CACHE["tags"], _FILTERS_CACHE["langs"]
+
+
+def has_doc(file_sha256: str) -> bool:
+    with closing(_connect()) as conn:
+        return conn.execute("SELECT 1 FROM docs WHERE file_sha256 = ? LIMIT 1", (file_sha256,)).fetchone() is not None
+
+
 def get_detail_by_sha(file_sha256: str) -> Dict[str, Any]:
-    rows = read_csv_rows()
-    for r in rows:
-        if r.get("file_sha256") == file_sha256:
-            # Load the per-file JSON if present; else reconstruct from CSV row
-            json_path = os.path.join(OUT_DIR, pd.sanitize_filename(r["file_name"]) + ".json")
-            if os.path.exists(json_path):
-                with open(json_path, "r", encoding="utf-8") as jf:
-                    return json.load(jf)
-            # Fallback: minimal reconstruction
-            return {
-                "source_path": r.get("source_path"),
-                "file_name": r.get("file_name"),
-                "file_sha256": r.get("file_sha256"),
-                "language": r.get("language"),
-                "title": r.get("title"),
-                "summary_sentences": (r.get("summary") or "").split(" • ") if r.get("summary") else [],
-                "action_items": (r.get("action_items") or "").split(" | ") if r.get("action_items") else [],
-                "tags": (r.get("tags") or "").split("; ") if r.get("tags") else ["General"],
-                "detected_dates": (r.get("detected_dates") or "").split("; ") if r.get("detected_dates") else [],
-                "detected_amounts": (r.get("detected_amounts") or "").split("; ") if r.get("detected_amounts") else [],
-                "first_seen_at": r.get("first_seen_at"),
-            }
-    raise FileNotFoundError("Summary not found for sha256: " + file_sha256)
+    with closing(_connect()) as conn:
+        row = conn.execute("SELECT json FROM docs WHERE file_sha256 = ? LIMIT 1", (file_sha256,)).fetchone()
+    if row is None:
+        raise FileNotFoundError("Summary not found for sha256: " + file_sha256)
+    return json.loads(row["json"])
+
+
+init_db()
 
 
 # ------- Routes -------
@@ -130,6 +349,7 @@ INDEX_HTML = """
     .tag { background: #eef; border: 1px solid #ccd; padding: 2px 6px; margin-right: 4px; border-radius: 4px; display: inline-block; }
     .filters { display: flex; gap: 8px; align-items: center; flex-wrap: wrap; }
     .filters label { font-size: 12px; color: #333; }
+    .pager { display: flex; gap: 12px; align-items: center; }
   </style>
 </head>
 <body>
@@ -212,6 +432,11 @@ INDEX_HTML = """
       {% endfor %}
     </tbody>
   </table>
+  <p class="pager">
+    {% if page > 1 %}<a href="{{ url_for('index', page=page - 1, **page_args) }}">← Prev</a>{% endif %}
+    Page {{ page }} of {{ pages }} ({{ total }} summaries)
+    {% if page < pages %}<a href="{{ url_for('index', page=page + 1, **page_args) }}">Next →</a>{% endif %}
+  </p>
   {% else %}
     <p>No summaries yet. Upload a document to get started.</p>
   {% endif %}
@@ -260,58 +485,49 @@ DETAIL_HTML = """
 </html>
 """
 
+# Parsed and compiled once; render_template() accepts Template objects directly
+_INDEX_TPL = app.jinja_env.from_string(INDEX_HTML)
+_DETAIL_TPL = app.jinja_env.from_string(DETAIL_HTML)
+
 
 @app.route("/")
 def index():
-    rows = read_csv_rows()
-
-    # Build filter options
-    tag_set = set()
-    lang_set = set()
-    for r in rows:
-        if r.get("tags"):
-            for t in r["tags"].split("; "):
-                if t:
-                    tag_set.add(t)
-        if r.get("language"):
-            lang_set.add(r["language"])
-    available_tags = sorted(tag_set)
-    available_langs = sorted(lang_set)
+    sync_db_from_csv()
+    available_tags, available_langs = available_filters()
 
     # Read filters
     q = request.args.get("q", default="").strip()
     tag = request.args.get("tag", default="").strip()
     lang = request.args.get("lang", default="").strip()
 
-    ql = q.lower()
-    def match(r: Dict[str, Any]) -> bool:
-        if tag and (tag not in (r.get("tags") or "")):
-            return False
-        if lang and (r.get("language") != lang):
-            return False
-        if q:
-            hay = " ".join([
-                r.get("file_name", ""),
-                r.get("title", ""),
-                r.get("summary", ""),
-                r.get("action_items", ""),
-                r.get("detected_dates", ""),
-                r.get("detected_amounts", ""),
-            ]).lower()
-            if ql not in hay:
-                return False
-        return True
-
-    filtered = [r for r in rows if match(r)]
-
-    return render_template_string(
-        INDEX_HTML,
+    # Pagination: only the requested page is fetched and rendered
+    page_size = request.args.get("page_size", default=PAGE_SIZE, type=int) or PAGE_SIZE
+    if page_size < 1:
+        page_size = PAGE_SIZE
+    page_size = min(page_size, MAX_PAGE_SIZE)
+    total = count_rows(q=q, tag=tag, lang=lang)
+    pages = max((total + page_size - 1) // page_size, 1)
+    page = min(max(request.args.get("page", default=1, type=int) or 1, 1), pages)
+
+    filtered = query_rows(q=q, tag=tag, lang=lang, limit=page_size, offset=(page - 1) * page_size)
+
+    # Query args carried over by the prev/next links
+    page_args = {k: v for k, v in (("q", q), ("tag", tag), ("lang", lang)) if v}
+    if page_size != PAGE_SIZE:
+        page_args["page_size"] = page_size
+
+    return render_template(
+        _INDEX_TPL,
         rows=filtered,
         q=q,
         tag=tag,
         lang=lang,
         available_tags=available_tags,
         available_langs=available_langs,
+        page=page,
+        pages=pages,
+        total=total,
+        page_args=page_args,
     )
 
 
@@ -321,9 +537,13 @@ def upload():
         flash("No files provided")
         return redirect(url_for("index"))
 
+    sync_db_from_csv()  # so de-duplication also sees documents added by the CLI
     files = request.files.getlist("files")
     processed = 0
     rejected = 0
+    duplicates = 0
+    # save_path -> (save_path, max_sentences, sha)
+    jobs: Dict[str, Tuple[str, int, str]] = {}
 
     for file in files:
         if file.filename == "":
@@ -333,24 +553,42 @@ def upload():
             continue
         safe_name = pd.sanitize_filename(file.filename)
         save_path = os.path.join(UPLOAD_DIR, safe_name)
-        file.save(save_path)
-
-        # Process the uploaded file
-        ds = pd.process(save_path, max_sentences=5)
+        spool, sha = spool_upload(file)
+        with spool:
+            if any(job[2] == sha for job in jobs.values()) or has_doc(sha):
+                # Same content was summarized before; keep the existing upload and record
+                duplicates += 1
+                continue
+            if save_path in jobs:
+                # Same name, different content earlier in this request: keep both files
+                base, ext = os.path.splitext(safe_name)
+                save_path = os.path.join(UPLOAD_DIR, f"{base}_{sha[:12]}{ext}")
+            with open(save_path, "wb") as out:
+                shutil.copyfileobj(spool, out, 1 << 20)
+        jobs[save_path] = (save_path, 5, sha)
+
+    # Process the uploaded files (in worker processes when there are several)
+    summaries: List[pd.DocSummary] = []
+    for path, ds, err in pd.process_many(list(jobs.values()), workers=POOL_WORKERS):
+        if err:
+            app.logger.warning("Error processing %s: %s", path, err)
         if ds:
-            append_outputs(ds)
+            summaries.append(ds)
             processed += 1
         else:
             rejected += 1
 
-    flash(f"Uploaded/processed: {processed}; rejected: {rejected}")
+    append_outputs_batch(summaries)
+
+    flash(f"Uploaded/processed: {processed}; rejected: {rejected}; already processed: {duplicates}")
     return redirect(url_for("index"))
 
 
 @app.route("/detail/<file_sha256>")
 def detail(file_sha256: str):
+    sync_db_from_csv()
     d = get_detail_by_sha(file_sha256)
-    return render_template_string(DETAIL_HTML, d=d)
+    return render_template(_DETAIL_TPL, d=d)
 
 
 @app.route("/download/<path:filename>")
@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
 import argparse
+import codecs
 import csv
 import hashlib
+import heapq
+import io
 import json
+import mmap
 import os
 import re
 import sys
 import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, asdict
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional, Iterable
+from functools import cached_property
+from itertools import chain
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Pattern
 
 from langdetect import detect, DetectorFactory
 from tqdm import tqdm
@@ -20,6 +28,11 @@ try:
 except Exception:
     PdfReader = None  # type: ignore
 
+try:
+    import pypdfium2 as pdfium  # faster text extraction (C++ PDFium); preferred when installed
+except Exception:
+    pdfium = None  # type: ignore
+
 try:
     import docx  # python-docx
 except Exception:
@@ -30,10 +43,44 @@ try:
 except Exception:
     chardet = None  # type: ignore
 
+try:
+    import fcntl  # advisory locks for appends shared between processes
+except ImportError:
+    fcntl = None  # type: ignore  # Windows
+
+# Optional speedup: faster JSON encoding
+try:
+    import orjson
+except Exception:
+    orjson = None  # type: ignore
+
+# Optional speedup: fastText language ID (C++) when its lid.176 model is available;
+# langdetect stays the fallback
+LID_MODEL_PATH = os.environ.get(
+    "DATAAPP_LID_MODEL", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lid.176.ftz")
+)
+try:
+    import fasttext
+
+    _LID = fasttext.load_model(LID_MODEL_PATH) if os.path.exists(LID_MODEL_PATH) else None
+except Exception:
+    _LID = None
+
+# Optional speedup: single-pass keyword matching
+try:
+    import ahocorasick  # pyahocorasick
+except Exception:
+    ahocorasick = None  # type: ignore
+
 DetectorFactory.seed = 0  # deterministic language detection
 
 SUPPORTED_EXTS = {".pdf", ".docx", ".txt"}
 
+CHARDET_SAMPLE_BYTES = 64 * 1024  # leading bytes used for encoding detection
+OUTPUT_BUFFER_BYTES = 1 << 20  # write buffer for summary.csv / route_<TAG>.jsonl appends
+# Outputs are derived (rebuildable from the inputs), so fsync is opt-in for crash durability
+FSYNC_OUTPUTS = os.environ.get("DATAAPP_FSYNC") == "1"
+
 ENG_STOP = set(
     """
     a an and are as at be by for from has have he her hers him his i in is it its of on or our so that the their them they this to was were will with you your we us not no if but into over under across while when where which who whom whose why how than then too very can may shall must should would could there here also more most less least each per upon via among within without above below before after between during against further such only same own both any all few many much other some nor like just ever never always often sometimes else one two three four five six seven eight nine ten
@@ -87,11 +134,49 @@ ACTION_CLUES = [
     "no later than", "not later than", "by ", "prior to", "immediately", "within ", "ensure",
 ]
 
+# Compiled once at import; these run on every document
+_DATE_RES = [re.compile(p, re.IGNORECASE) for p in DATE_PATTERNS]
+_DATE_ANY_RE = re.compile("|".join(DATE_PATTERNS), re.IGNORECASE)
+_ACTION_RE = re.compile("|".join(map(re.escape, ACTION_CLUES)))
+_AMOUNT_RES = [re.compile(p, re.IGNORECASE) for p in AMOUNT_PATTERNS]
+_NEWLINE_RE = re.compile(r"\r\n|\r|\n")
+_TAB_RE = re.compile(r"\t")
+_SPACES_RE = re.compile(r"[ \u00A0]+")
+_SENT_SPLIT_RE = re.compile(r"(?<=[\.!?\u0964\u0965\u0D3A\u0D3B])\s+|\n+")
+_TOKEN_SPLIT_RE = re.compile(r"[^\w\u00C0-\u1FFF\u2C00-\uD7FF]+")
+_UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
+_MALAYALAM_RE = re.compile(r"[\u0D00-\u0D7F]")
+
+
+def _build_automaton(keyword_values: Dict[str, List[str]]):
+    # keyword -> values reported when it occurs; None when pyahocorasick is unavailable
+    if ahocorasick is None:
+        return None
+    A = ahocorasick.Automaton()
+    for k, values in keyword_values.items():
+        A.add_word(k, tuple(values))
+    A.make_automaton()
+    return A
+
+
+def _tag_keywords() -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for tag, keys in TAG_RULES.items():
+        for k in keys:
+            out.setdefault(k.lower(), []).append(tag)
+    return out
+
+
+_TAG_AUTOMATON = _build_automaton(_tag_keywords())
+_ACTION_AUTOMATON = _build_automaton({c: [c] for c in ACTION_CLUES})
+
 
 def sha256_of_file(path: str) -> str:
-    h = hashlib.sha256()
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+: reads and hashes in C
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
             h.update(chunk)
     return h.hexdigest()
 
@@ -99,31 +184,77 @@ def sha256_of_file(path: str) -> str:
 def sniff_read_text(path: str) -> str:
     # For .txt files, detect encoding if chardet is available
     with open(path, "rb") as f:
-        raw = f.read()
-    encoding = None
-    if chardet:
-        r = chardet.detect(raw)
-        encoding = r.get("encoding")
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        # Map the file instead of read()ing a private copy, and let chardet see only a leading sample
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            encoding = None
+            if chardet:
+                r = chardet.detect(mm[:CHARDET_SAMPLE_BYTES])
+                encoding = r.get("encoding")
+                if len(mm) > CHARDET_SAMPLE_BYTES and (encoding or "").lower() in ("", "ascii", "utf-8"):
+                    # The sample may end before the first non-ASCII byte: keep the guess only if
+                    # the whole file is valid UTF-8, else detect on the full content
+                    with memoryview(mm) as mv:
+                        try:
+                            return str(mv, "utf-8")
+                        except UnicodeDecodeError:
+                            pass
+                    encoding = chardet.detect(mm[:]).get("encoding")
+            try:
+                codecs.lookup(encoding or "utf-8")
+            except LookupError:
+                encoding = "utf-8"
+            with memoryview(mm) as mv:
+                return str(mv, encoding or "utf-8", errors="ignore")
+
+
+def _read_pdf_pdfium(path: str) -> str:
+    pdf = pdfium.PdfDocument(path)
+    buf = io.StringIO()
     try:
-        return raw.decode(encoding or "utf-8", errors="ignore")
-    except LookupError:
-        return raw.decode("utf-8", errors="ignore")
+        for page in pdf:
+            try:
+                textpage = page.get_textpage()
+                try:
+                    t = textpage.get_text_range()
+                finally:
+                    textpage.close()
+            except Exception:
+                t = ""
+            finally:
+                page.close()
+            if t:
+                if buf.tell():
+                    buf.write("\n")
+                buf.write(t)
+    finally:
+        pdf.close()
+    return buf.getvalue()
 
 
 def read_pdf(path: str) -> str:
+    if pdfium is not None:
+        try:
+            return _read_pdf_pdfium(path)
+        except Exception:
+            pass  # fall back to pypdf
     if PdfReader is None:
         return ""
     try:
         reader = PdfReader(path)
-        texts = []
+        # Pages are extracted one at a time into a single buffer; text-less pages are skipped
+        buf = io.StringIO()
         for page in reader.pages:
             try:
                 t = page.extract_text() or ""
             except Exception:
                 t = ""
             if t:
-                texts.append(t)
-        return "\n".join(texts)
+                if buf.tell():
+                    buf.write("\n")
+                buf.write(t)
+        return buf.getvalue()
     except Exception:
         return ""
 
@@ -141,9 +272,9 @@ def read_docx(path: str) -> str:
 
 def clean_text(text: str) -> str:
     # Normalize whitespace
-    text = re.sub(r"\r\n|\r|\n", "\n", text)
-    text = re.sub(r"\t", " ", text)
-    text = re.sub(r"[ \u00A0]+", " ", text)
+    text = _NEWLINE_RE.sub("\n", text)
+    text = _TAB_RE.sub(" ", text)
+    text = _SPACES_RE.sub(" ", text)
     return text.strip()
 
 
@@ -151,6 +282,17 @@ def detect_language(text: str) -> str:
     sample = text[:5000] if text else ""
     if not sample:
         return "unknown"
+    # Mostly Malayalam script up front: no model needed
+    head = sample[:1024]
+    if len(_MALAYALAM_RE.findall(head)) > 0.2 * len(head):
+        return "ml"
+    if _LID is not None:
+        try:
+            labels, _ = _LID.predict(sample.replace("\n", " "), k=1)
+            if labels:
+                return labels[0].replace("__label__", "")
+        except Exception:
+            pass
     try:
         lang = detect(sample)
     except Exception:
@@ -160,79 +302,88 @@ def detect_language(text: str) -> str:
 
 def split_sentences(text: str) -> List[str]:
     # Simple sentence splitter for . ! ? and Malayalam | Devanagari danda marks
-    s = re.split(r"(?<=[\.!?\u0964\u0965\u0D3A\u0D3B])\s+|\n+", text)
+    s = _SENT_SPLIT_RE.split(text)
     sentences = [x.strip() for x in s if x and x.strip()]
     return sentences
 
 
 def tokenize(text: str) -> List[str]:
-    return [w for w in re.split(r"[^\w\u00C0-\u1FFF\u2C00-\uD7FF]+", text.lower()) if w]
+    return [w for w in _TOKEN_SPLIT_RE.split(text.lower()) if w]
 
 
-def summarize_extractive(text: str, max_sentences: int, lang: str) -> List[str]:
-    sentences = split_sentences(text)
+def summarize_extractive(
+    text: str, max_sentences: int, lang: str, sentences: Optional[List[str]] = None
+) -> List[str]:
+    if sentences is None:
+        sentences = split_sentences(text)
     if not sentences:
         return []
     if len(sentences) <= max_sentences:
         return sentences
 
     stop = ENG_STOP if lang.startswith("en") else ML_STOP
-    # Score sentences by sum of token frequencies (excluding stopwords), normalized by sentence length
-    freq: Dict[str, int] = {}
-    for s in sentences:
-        for tok in tokenize(s):
-            if tok in stop:
-                continue
-            freq[tok] = freq.get(tok, 0) + 1
+    # Score sentences by sum of token frequencies (excluding stopwords), normalized by sentence length.
+    # Each sentence is tokenized once; the same token lists feed the frequencies and the scores.
+    toks_per_sent = [[t for t in tokenize(s) if t not in stop] for s in sentences]
+    freq = Counter(chain.from_iterable(toks_per_sent))
 
-    def score(s: str) -> float:
-        toks = [t for t in tokenize(s) if t not in stop]
+    def score(toks: List[str]) -> float:
         if not toks:
             return 0.0
-        return sum(freq.get(t, 0) for t in toks) / (len(toks) ** 0.6)
+        return sum(freq[t] for t in toks) / (len(toks) ** 0.6)
+
+    scores = [score(toks) for toks in toks_per_sent]
+    # Ties go to the later sentence, as before
+    top = heapq.nlargest(max_sentences, range(len(sentences)), key=lambda i: (scores[i], i))
+    return [sentences[i] for i in sorted(top)]  # restore original order
+
 
-    ranked = sorted(((score(s), i, s) for i, s in enumerate(sentences)), reverse=True)
-    top = sorted(ranked[:max_sentences], key=lambda x: x[1])  # restore original order
-    return [s for _, _, s in top]
+def find_patterns(text: str, patterns: List[Pattern[str]]) -> List[str]:
+    # Deduplicate while preserving order (first cased form wins)
+    return list(dict.fromkeys(m.group(0) for p in patterns for m in p.finditer(text)))
 
 
-def find_patterns(text: str, patterns: List[str]) -> List[str]:
-    found = []
-    for p in patterns:
-        found += re.findall(p, text, flags=re.IGNORECASE)
-    # Deduplicate while preserving order
-    seen = set()
-    uniq = []
-    for x in found:
-        if x not in seen:
-            seen.add(x)
-            uniq.append(x)
-    return uniq
+def _has_action_clue(lnl: str) -> bool:
+    if _ACTION_AUTOMATON is not None:
+        return next(_ACTION_AUTOMATON.iter(lnl), None) is not None
+    return _ACTION_RE.search(lnl) is not None
 
 
-def extract_action_items(text: str) -> List[str]:
-    lines = [ln.strip() for ln in text.split("\n") if ln.strip()]
+def extract_action_items(
+    text: str, limit: int = 10, lines: Optional[List[str]] = None, lines_lower: Optional[List[str]] = None
+) -> List[str]:
+    # Lines with an action clue or a date mention, in document order; stop at the cap.
+    # lines / lines_lower (text split on "\n", and its lowercased twin) may be passed in precomputed.
+    if lines is None:
+        lines = text.split("\n")
     out = []
-    for ln in lines:
-        lnl = ln.lower()
-        if any(clue in lnl for clue in ACTION_CLUES):
+    for i, ln in enumerate(lines):
+        ln = ln.strip()
+        if not ln:
+            continue
+        lnl = lines_lower[i].strip() if lines_lower is not None else ln.lower()
+        if _has_action_clue(lnl) or _DATE_ANY_RE.search(ln):
             out.append(ln)
-    # Add lines around dates explicitly if they contain date mentions
-    dates = find_patterns(text, DATE_PATTERNS)
-    if dates:
-        for ln in lines:
-            if any(d in ln for d in dates):
-                if ln not in out:
-                    out.append(ln)
-    return out[:10]
-
-
-def tag_text(text: str) -> List[str]:
-    tl = text.lower()
-    tags = []
-    for tag, keys in TAG_RULES.items():
-        if any(k in tl for k in keys):
-            tags.append(tag)
+            if len(out) == limit:
+                break
+    return out
+
+
+def tag_text(text: str, text_lower: Optional[str] = None) -> List[str]:
+    tl = text_lower if text_lower is not None else text.lower()
+    if _TAG_AUTOMATON is not None:
+        # One pass over the text for all keywords; report tags in TAG_RULES order
+        hit = set()
+        for _, matched in _TAG_AUTOMATON.iter(tl):
+            hit.update(matched)
+            if len(hit) == len(TAG_RULES):
+                break
+        tags = [tag for tag in TAG_RULES if tag in hit]
+    else:
+        tags = []
+        for tag, keys in TAG_RULES.items():
+            if any(k in tl for k in keys):
+                tags.append(tag)
     if not tags:
         tags = ["General"]
     return tags
@@ -252,6 +403,17 @@ class DocSummary:
     detected_amounts: List[str]
     first_seen_at: str
 
+    @cached_property
+    def _joined_fields(self) -> Tuple[str, str, str, str, str]:
+        # List fields as they appear in the CSV; joined once per summary
+        return (
+            " • ".join(self.summary_sentences),
+            " | ".join(self.action_items),
+            "; ".join(self.tags),
+            "; ".join(self.detected_dates),
+            "; ".join(self.detected_amounts),
+        )
+
     def to_csv_row(self) -> List[str]:
         return [
             self.source_path,
@@ -259,11 +421,7 @@ class DocSummary:
             self.file_sha256,
             self.language,
             self.title,
-            " • ".join(self.summary_sentences),
-            " | ".join(self.action_items),
-            "; ".join(self.tags),
-            "; ".join(self.detected_dates),
-            "; ".join(self.detected_amounts),
+            *self._joined_fields,
             self.first_seen_at,
         ]
 
@@ -304,10 +462,10 @@ def iter_files(root: str) -> Iterable[str]:
 
 
 def sanitize_filename(name: str) -> str:
-    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    return _UNSAFE_FILENAME_RE.sub("_", name)
 
 
-def process(path: str, max_sentences: int) -> Optional[DocSummary]:
+def process(path: str, max_sentences: int, sha_override: Optional[str] = None) -> Optional[DocSummary]:
     text = read_text_for_file(path)
     if not text:
         return None
@@ -315,12 +473,15 @@ def process(path: str, max_sentences: int) -> Optional[DocSummary]:
     lang = detect_language(text)
     sentences = split_sentences(text)
     title = sentences[0][:140] if sentences else os.path.basename(path)
-    summary = summarize_extractive(text, max_sentences=max_sentences, lang=lang)
-    actions = extract_action_items(text)
-    tags = tag_text(text)
-    dates = find_patterns(text, DATE_PATTERNS)
-    amounts = find_patterns(text, AMOUNT_PATTERNS)
-    sha = sha256_of_file(path)
+    summary = summarize_extractive(text, max_sentences=max_sentences, lang=lang, sentences=sentences)
+    # Lowercase and split the text once; the action and tag passes share the results
+    text_lower = text.lower()
+    actions = extract_action_items(text, lines=text.split("\n"), lines_lower=text_lower.split("\n"))
+    tags = tag_text(text, text_lower=text_lower)
+    dates = find_patterns(text, _DATE_RES)
+    amounts = find_patterns(text, _AMOUNT_RES)
+    # Callers that already hashed the file while writing it can pass the digest
+    sha = sha_override or sha256_of_file(path)
     return DocSummary(
         source_path=os.path.abspath(path),
         file_name=os.path.basename(path),
@@ -336,72 +497,245 @@ def process(path: str, max_sentences: int) -> Optional[DocSummary]:
     )
 
 
+def dumps_json(obj) -> str:
+    # Compact, non-ASCII kept as-is
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def write_json_file(path: str, obj):
+    # Pretty-printed with a 2-space indent
+    if orjson is not None:
+        with open(path, "wb") as jf:
+            jf.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, "w", encoding="utf-8") as jf:
+        json.dump(obj, jf, ensure_ascii=False, indent=2)
+
+
+def _process_for_pool(job: Tuple) -> Tuple[str, Optional[DocSummary], Optional[str]]:
+    # Top-level so worker processes can import it; errors are returned, not raised,
+    # so one bad document does not abort the whole map()
+    try:
+        return job[0], process(*job), None
+    except Exception as ex:
+        return job[0], None, str(ex)
+
+
+def process_many(
+    jobs: List[Tuple], workers: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[DocSummary], Optional[str]]]:
+    """Run process(*job) for each job, yielding (path, summary, error) in job order.
+
+    Uses a process pool when more than one worker would be busy; otherwise runs inline.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        yield from map(_process_for_pool, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        yield from ex.map(_process_for_pool, jobs)
+
+
+class _AppendFile:
+    """Append-only output file that only ever writes whole records.
+
+    Text passed to write() is collected in memory and appended with one write()
+    under an exclusive flock once `buffering` bytes of UTF-8 are pending, or on
+    flush(). Other processes appending to the same file (gunicorn workers, the
+    CLI) therefore never see a record split or interleaved with theirs.
+    """
+
+    def __init__(self, path: str, buffering: int = OUTPUT_BUFFER_BYTES):
+        self.buffering = buffering
+        self._fh = open(path, "ab", buffering=0)
+        self._pending: List[bytes] = []
+        self._size = 0
+        self.bytes_written = 0
+
+    def write(self, s: str) -> int:
+        b = s.encode("utf-8")
+        self._pending.append(b)
+        self._size += len(b)
+        if self._size >= self.buffering:
+            self.flush()
+        return len(s)
+
+    def flush(self):
+        if not self._pending:
+            return
+        data = memoryview(b"".join(self._pending))
+        self._pending.clear()
+        self._size = 0
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        try:
+            while data:
+                n = self._fh.write(data)
+                self.bytes_written += n
+                data = data[n:]
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+
+    def fileno(self) -> int:
+        return self._fh.fileno()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._fh.close()
+
+
+def _sync(fh):
+    fh.flush()
+    if FSYNC_OUTPUTS:
+        os.fsync(fh.fileno())
+
+
+def _sync_and_close(fh):
+    # Close even if flush/fsync fails (e.g. ENOSPC), so the descriptor is not leaked
+    try:
+        _sync(fh)
+    finally:
+        fh.close()
+
+
+class RouteHandlePool:
+    """Open append handles for route_<TAG>.jsonl, at most max_open at a time.
+
+    Handles are opened on first use and the least recently used one is closed
+    when the pool is full.
+    """
+
+    def __init__(self, out_dir: str, max_open: int = 32, buffering: int = OUTPUT_BUFFER_BYTES):
+        self.out_dir = out_dir
+        self.max_open = max_open
+        self.buffering = buffering
+        self._handles: "OrderedDict[str, _AppendFile]" = OrderedDict()
+
+    def get(self, tag: str) -> _AppendFile:
+        fh = self._handles.get(tag)
+        if fh is not None:
+            self._handles.move_to_end(tag)
+            return fh
+        fname = os.path.join(self.out_dir, f"route_{sanitize_filename(tag)}.jsonl")
+        fh = self._handles[tag] = _AppendFile(fname, buffering=self.buffering)
+        if len(self._handles) > self.max_open:
+            _, oldest = self._handles.popitem(last=False)
+            _sync_and_close(oldest)
+        return fh
+
+    def flush(self):
+        for h in self._handles.values():
+            _sync(h)
+
+    def close(self):
+        for h in self._handles.values():
+            try:
+                _sync_and_close(h)
+            except Exception:
+                pass
+        self._handles.clear()
+
+
+class OutputWriter:
+    """Appends summaries to summary.csv, route_<TAG>.jsonl and optional per-file JSON.
+
+    The CSV and route files are opened once and kept open until close(), so a batch
+    of documents costs one open per output file rather than one per document.
+    Pass a long-lived RouteHandlePool as routes to keep route files open across
+    batches; close() then only flushes it.
+    """
+
+    def __init__(self, out_dir: str, per_file_json: bool = False, routes: Optional[RouteHandlePool] = None):
+        self.out_dir = out_dir
+        self.per_file_json = per_file_json
+        self.csv_path = os.path.join(out_dir, "summary.csv")
+        csv_new = not os.path.exists(self.csv_path)
+        self._csvf = _AppendFile(self.csv_path)
+        # "\n" rows (not the csv default "\r\n"); written as-is, so embedded newlines stay intact
+        self._writer = csv.writer(self._csvf, quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+        if csv_new:
+            self._writer.writerow(DocSummary.csv_header())
+        self._owns_routes = routes is None
+        self._routes = routes if routes is not None else RouteHandlePool(out_dir)
+
+    def write(self, ds: DocSummary) -> Dict:
+        """Write one summary to every output; returns the JSON record."""
+        self._writer.writerow(ds.to_csv_row())
+
+        rec = asdict(ds)
+        line = dumps_json(rec) + "\n"
+        for tag in ds.tags:
+            self._routes.get(tag).write(line)
+
+        if self.per_file_json:
+            per_json = os.path.join(self.out_dir, sanitize_filename(ds.file_name) + ".json")
+            write_json_file(per_json, rec)
+        return rec
+
+    @property
+    def csv_bytes_written(self) -> int:
+        """Bytes this writer has appended to summary.csv so far (header included)."""
+        return self._csvf.bytes_written
+
+    def close(self):
+        # Outputs reach the OS once here, at the end of the batch
+        try:
+            _sync_and_close(self._csvf)
+        finally:
+            if self._owns_routes:
+                self._routes.close()
+            else:
+                self._routes.flush()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 def main():
     ap = argparse.ArgumentParser(description="KMRL Document Summarizer MVP")
     ap.add_argument("--input", required=True, help="Input directory containing documents")
     ap.add_argument("--out", required=True, help="Output directory for summaries")
     ap.add_argument("--max-sentences", type=int, default=5, help="Max sentences in summary")
     ap.add_argument("--per-file-json", action="store_true", help="Write a .json per input file")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
     args = ap.parse_args()
 
     in_dir = os.path.abspath(args.input)
     out_dir = os.path.abspath(args.out)
     os.makedirs(out_dir, exist_ok=True)
 
-    csv_path = os.path.join(out_dir, "summary.csv")
-
-    # Prepare route files map (tag -> open handle)
-    route_handles: Dict[str, any] = {}
-
-    def write_route(tag: str, record: Dict):
-        fname = os.path.join(out_dir, f"route_{sanitize_filename(tag)}.jsonl")
-        if tag not in route_handles:
-            route_handles[tag] = open(fname, "a", encoding="utf-8")
-        route_handles[tag].write(json.dumps(record, ensure_ascii=False) + "\n")
-
     # Process
     files = list(iter_files(in_dir))
     if not files:
         print(f"No supported documents found in {in_dir}")
         return 2
 
-    # CSV header
-    csv_new = not os.path.exists(csv_path)
-
-    with open(csv_path, "a", encoding="utf-8", newline="") as csvf:
-        writer = csv.writer(csvf)
-        if csv_new:
-            writer.writerow(DocSummary.csv_header())
-
-        for fp in tqdm(files, desc="Processing docs", unit="file"):
+    # Documents are parsed in worker processes; outputs are written here, in input order
+    jobs = [(fp, args.max_sentences) for fp in files]
+    with OutputWriter(out_dir, per_file_json=args.per_file_json) as out:
+        results = process_many(jobs, workers=args.workers)
+        for fp, ds, err in tqdm(results, total=len(jobs), desc="Processing docs", unit="file"):
+            if err:
+                # Log minimal error, continue
+                sys.stderr.write(f"Error processing {fp}: {err}\n")
+                continue
+            if not ds:
+                continue
             try:
-                ds = process(fp, args.max_sentences)
-                if not ds:
-                    continue
-                writer.writerow(ds.to_csv_row())
-
-                rec = asdict(ds)
-                for tag in ds.tags:
-                    write_route(tag, rec)
-
-                if args.per_file_json:
-                    per_json = os.path.join(out_dir, sanitize_filename(ds.file_name) + ".json")
-                    with open(per_json, "w", encoding="utf-8") as jf:
-                        json.dump(rec, jf, ensure_ascii=False, indent=2)
-            except KeyboardInterrupt:
-                raise
+                out.write(ds)
             except Exception as ex:
-                # Log minimal error, continue
+                # One bad output (e.g. an unwritable per-file JSON) should not stop the batch
                 sys.stderr.write(f"Error processing {fp}: {ex}\n")
-                continue
-
-    for h in route_handles.values():
-        try:
-            h.close()
-        except Exception:
-            pass
 
-    print(f"Done. CSV: {csv_path}")
+    print(f"Done. CSV: {out.csv_path}")
     return 0
 
 
@@ -0,0 +1,4 @@
+#!/usr/bin/env python3
+# WSGI entry point for gunicorn, e.g.:
+#   gunicorn -w "$(nproc)" --preload --worker-class gthread --threads 4 wsgi:app
+from app import app  # noqa: F401